@@ -1,10 +1,8 @@
 #! /usr/bin/env python
 
+import asyncio
 import curses
 import signal
-import socket
-import threading
-import time
 
 from f1_2019_telemetry.packets import (
     CarTelemetryData_V1,
@@ -16,18 +14,33 @@ from f1_2019_telemetry.packets import (
     unpack_udp_packet,
     PacketCarStatusData_V1,
     PacketEventData_V1,
+    UnpackError,
 )
 
 from f1_telemetry.render import Renderer
+from f1_telemetry.snapshot import Snapshotter
 
-udp_socket = socket.socket(family=socket.AF_INET, type=socket.SOCK_DGRAM)
-udp_socket.bind(("", 20777))
+LISTEN_ADDRESS = ("", 20777)
+QUEUE_SIZE = 256
+SNAPSHOT_PATH = "race.snapshot"
+
+
+class PacketReceiver(asyncio.DatagramProtocol):
+    def __init__(self, queue: asyncio.Queue):
+        self._queue = queue
+
+    def datagram_received(self, data, addr):
+        try:
+            self._queue.put_nowait(data)
+        except asyncio.QueueFull:
+            # stale telemetry is worthless, drop the oldest to keep up
+            self._queue.get_nowait()
+            self._queue.put_nowait(data)
 
 
 class PacketProcessor:
-    def __init__(self, socket):
-        self.udp_socket = socket
-        socket.settimeout(0)
+    def __init__(self, address=LISTEN_ADDRESS, snapshotter=None, queue_size=QUEUE_SIZE):
+        self.address = address
 
         self.vehicle_index = {}
         self.team_index = {}
@@ -35,54 +48,143 @@ class PacketProcessor:
         self._renderer = None
         self.my_id = None
 
-        self._running = False
-        self._thread = None
+        self._snapshotter = snapshotter
+        self._restored_session = None
 
-    def start(self):
-        if self._running:
-            raise Exception("Processor already running")
+        self._queue_size = queue_size
+        self._queue = None
+        self._transport = None
+        self._task = None
+        self._snapshot_flush = None
 
-        t = threading.Thread(target=self.process)
-        self._thread = t
-        self._running = True
+    @property
+    def is_running(self):
+        return self._task is not None and not self._task.done()
 
-        self._renderer = Renderer()
-        self._renderer.clear()
+    async def start(self):
+        if self.is_running:
+            raise Exception("Processor already running")
 
-        t.start()
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=self._queue_size)
+        self._transport, _ = await loop.create_datagram_endpoint(
+            lambda: PacketReceiver(queue), local_addr=self.address
+        )
+        self._queue = queue
+
+        try:
+            self._renderer = Renderer()
+            self._renderer.clear()
+
+            if self._snapshotter is not None:
+                self.restore()
+                self._snapshotter.start()
+
+            self._task = asyncio.create_task(self.process())
+            # a done callback, unlike a finally in process(), also runs when
+            # the task is cancelled before it ever started
+            self._task.add_done_callback(self._close)
+        except BaseException:
+            # not running yet, so _close() won't be called to free the port
+            self._transport.close()
+            self._transport = None
+            self._queue = None
+            if self._renderer is not None:
+                self._renderer.destroy()
+                self._renderer = None
+            raise
 
     def stop(self):
-        if not self._running:
+        if not self.is_running:
             raise Exception("Processor not running")
 
-        self._running = False
-
-        self._thread.join()
-        self._thread = None
+        self._task.cancel()
 
-        self._renderer.destroy()
-        self._renderer = None
+    def handle_signal(self):
+        # a repeated signal can arrive after the task has already finished
+        if self.is_running:
+            self.stop()
 
-    def handle_signal(self, _signum, _stackframe):
-        self.stop()
+    async def wait_closed(self):
+        if self._task is None:
+            raise Exception("Processor not running")
 
-    def process(self):
-        while self._running:
-            udp_packet = self.listen()
-            if not udp_packet:
-                time.sleep(0.1)
+        try:
+            await asyncio.shield(self._task)
+        except asyncio.CancelledError:
+            # only swallow our own stop(), not cancellation of the caller
+            if not self._task.cancelled():
+                raise
+
+        if self._snapshot_flush is not None:
+            await self._snapshot_flush
+
+    async def process(self):
+        while True:
+            udp_packet = await self._queue.get()
+            try:
+                packet = unpack_udp_packet(udp_packet)
+            except (UnpackError, ValueError):
+                # anything can send to the port, ignore what isn't telemetry
                 continue
-            packet = unpack_udp_packet(udp_packet)
 
+            self._check_session(packet)
             self.parse_packet(packet)
+            self._record(packet, udp_packet)
 
-    def listen(self):
+    def _close(self, _task):
+        self._transport.close()
+        self._transport = None
+        self._queue = None
+
+        try:
+            if self._snapshotter is not None:
+                # joining the writer and the final write both block on disk,
+                # keep them off the loop; wait_closed() waits for them
+                loop = asyncio.get_running_loop()
+                self._snapshot_flush = loop.run_in_executor(
+                    None, self._snapshotter.stop
+                )
+        finally:
+            self._renderer.destroy()
+            self._renderer = None
+
+    def restore(self):
         try:
-            data = self.udp_socket.recv(2048)
-        except BlockingIOError:
-            return None
+            packets = [unpack_udp_packet(data) for data in self._snapshotter.load()]
+        except (UnpackError, ValueError):
+            # written by another game or library version, treat as no snapshot
+            self._snapshotter.clear()
+            return
+
+        # participants first so the indices are set before rendering lap data
+        packets.sort(key=lambda p: not isinstance(p, PacketParticipantsData_V1))
+        for packet in packets:
+            self.parse_packet(packet)
+
+        if packets:
+            self._restored_session = self._snapshotter.session_uid
 
-        return data
+    def _check_session(self, packet):
+        if self._restored_session is None:
+            return
+
+        # the snapshot was from another session, forget its drivers
+        if packet.header.sessionUID != self._restored_session:
+            self.vehicle_index.clear()
+            self.team_index.clear()
+            self.my_id = None
+            self._renderer.clear()
+
+        self._restored_session = None
+
+    def _record(self, packet, udp_packet):
+        # events are one-offs, replaying them after a restart would be wrong
+        if self._snapshotter is None or isinstance(packet, PacketEventData_V1):
+            return
+        self._snapshotter.record(
+            packet.header.sessionUID, packet.header.packetId, udp_packet
+        )
 
     def parse_packet(self, packet):
 
@@ -160,10 +262,20 @@ class Position:
         self.penalties = lap_data.penalties
 
 
+async def run():
+    p = PacketProcessor(snapshotter=Snapshotter(SNAPSHOT_PATH))
+    await p.start()
+
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGINT, p.handle_signal)
+    try:
+        await p.wait_closed()
+    finally:
+        loop.remove_signal_handler(signal.SIGINT)
+
+
 def main():
-    p = PacketProcessor(udp_socket)
-    signal.signal(signal.SIGINT, p.handle_signal)
-    p.start()
+    asyncio.run(run())
 
 
 if __name__ == "__main__":
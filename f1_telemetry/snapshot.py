@@ -0,0 +1,157 @@
+import logging
+import os
+import struct
+import tempfile
+import threading
+import time
+
+MAGIC = b"F1SS"
+VERSION = 1
+
+# magic, version, session uid, unix time written, number of packets
+_HEADER = struct.Struct("<4sBQdH")
+_ENTRY = struct.Struct("<BH")  # packet id, packet length
+
+logger = logging.getLogger(__name__)
+
+
+class Snapshotter:
+    """Keeps the latest raw udp packet of each type and periodically writes
+    them to disk from a background thread, so a restarted processor can
+    replay them and render straight away."""
+
+    def __init__(self, path, interval=5.0, max_age=60.0):
+        self.path = path
+        self.interval = interval
+        self.max_age = max_age
+
+        # swapped as a whole so the writer never pairs a uid with another
+        # session's packets
+        self._session = (None, {})
+        self._dirty = False
+
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @property
+    def session_uid(self):
+        return self._session[0]
+
+    def clear(self):
+        self._session = (None, {})
+
+    def record(self, session_uid, packet_id, data):
+        uid, packets = self._session
+        if uid == session_uid:
+            packets[packet_id] = data
+        else:
+            self._session = (session_uid, {packet_id: data})
+        self._dirty = True
+
+    def start(self):
+        if self._thread is not None:
+            raise Exception("Snapshotter already running")
+
+        self._stop_event.clear()
+        t = threading.Thread(target=self._run, daemon=True)
+        self._thread = t
+        t.start()
+
+    def stop(self):
+        if self._thread is None:
+            raise Exception("Snapshotter not running")
+
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+
+        self._try_write()
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self._try_write()
+
+    def _try_write(self):
+        # a failed snapshot shouldn't take the dashboard down with it
+        try:
+            self.write()
+        except OSError:
+            logger.exception("Failed to write snapshot to %s", self.path)
+
+    def write(self):
+        if not self._dirty:
+            return
+        # cleared up front so a record() during the write isn't lost, and set
+        # again below if the write fails so the next tick retries it
+        self._dirty = False
+
+        # copying an int -> bytes dict holds the GIL, so record() can't interleave
+        session_uid, packets = self._session
+        packets = dict(packets)
+
+        try:
+            self._replace(self.encode(session_uid, time.time(), packets))
+        except BaseException:
+            self._dirty = True
+            raise
+
+    def _replace(self, buffer):
+        # named after the snapshot so leftovers from a kill match *.snapshot.*
+        directory, name = os.path.split(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=name + ".")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(buffer)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def load(self):
+        try:
+            with open(self.path, "rb") as f:
+                session_uid, written_at, packets = self.decode(f.read())
+        except (OSError, ValueError):
+            return []
+
+        # an old snapshot is most likely from another race
+        if time.time() - written_at > self.max_age:
+            return []
+
+        self._session = (session_uid, packets)
+        return list(packets.values())
+
+    @staticmethod
+    def encode(session_uid, written_at, packets):
+        chunks = [_HEADER.pack(MAGIC, VERSION, session_uid, written_at, len(packets))]
+        for packet_id, data in packets.items():
+            chunks.append(_ENTRY.pack(packet_id, len(data)))
+            chunks.append(data)
+        return b"".join(chunks)
+
+    @staticmethod
+    def decode(buffer):
+        try:
+            magic, version, session_uid, written_at, count = _HEADER.unpack_from(buffer)
+        except struct.error:
+            raise ValueError("Snapshot truncated")
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a snapshot file")
+
+        packets = {}
+        offset = _HEADER.size
+        for _ in range(count):
+            try:
+                packet_id, length = _ENTRY.unpack_from(buffer, offset)
+            except struct.error:
+                raise ValueError("Snapshot truncated")
+            offset += _ENTRY.size
+            data = buffer[offset : offset + length]
+            if len(data) != length:
+                raise ValueError("Snapshot truncated")
+            packets[packet_id] = data
+            offset += length
+
+        return session_uid, written_at, packets
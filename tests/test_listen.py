@@ -0,0 +1,57 @@
+import asyncio
+import os
+import socket
+import tempfile
+import unittest
+from unittest import mock
+
+from f1_telemetry import listen
+from f1_telemetry.snapshot import Snapshotter
+
+
+class FakeRenderer:
+    def clear(self):
+        pass
+
+    def refresh(self):
+        pass
+
+    def destroy(self):
+        pass
+
+
+@mock.patch.object(listen, "Renderer", FakeRenderer)
+class TestPacketProcessor(unittest.IsolatedAsyncioTestCase):
+    async def test_stop_straight_after_start_releases_port(self):
+        with tempfile.TemporaryDirectory() as directory:
+            snapshotter = Snapshotter(os.path.join(directory, "race.snapshot"))
+            p = listen.PacketProcessor(("127.0.0.1", 0), snapshotter)
+
+            await p.start()
+            port = p._transport.get_extra_info("sockname")[1]
+            p.stop()
+            await p.wait_closed()
+
+            self.assertFalse(p.is_running)
+            self.assertIsNone(snapshotter._thread)
+
+            # transports close their socket on the next loop iteration
+            await asyncio.sleep(0)
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+                s.bind(("127.0.0.1", port))
+
+    async def test_wait_closed_before_start(self):
+        p = listen.PacketProcessor(("127.0.0.1", 0))
+
+        with self.assertRaisesRegex(Exception, "Processor not running"):
+            await p.wait_closed()
+
+    async def test_handle_signal_after_stop_is_ignored(self):
+        p = listen.PacketProcessor(("127.0.0.1", 0))
+
+        await p.start()
+        p.handle_signal()
+        await p.wait_closed()
+        p.handle_signal()
+
+        self.assertFalse(p.is_running)
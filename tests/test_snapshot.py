@@ -0,0 +1,42 @@
+import os
+import tempfile
+import unittest
+
+from f1_telemetry.snapshot import Snapshotter
+
+
+class TestSnapshotter(unittest.TestCase):
+    def test_round_trip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "race.snapshot")
+            snapshotter = Snapshotter(path)
+            snapshotter.record(7, 4, b"participants")
+            snapshotter.record(7, 2, b"lap data")
+            snapshotter.write()
+
+            restored = Snapshotter(path)
+            self.assertEqual(restored.load(), [b"participants", b"lap data"])
+            self.assertEqual(restored.session_uid, 7)
+            self.assertEqual(os.listdir(directory), ["race.snapshot"])
+
+    def test_stale_snapshot_is_ignored(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "race.snapshot")
+            snapshotter = Snapshotter(path)
+            snapshotter.record(7, 2, b"lap data")
+            snapshotter.write()
+
+            self.assertEqual(Snapshotter(path, max_age=-1).load(), [])
+
+    def test_failed_write_is_retried(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "missing", "race.snapshot")
+            snapshotter = Snapshotter(path)
+            snapshotter.record(7, 2, b"lap data")
+
+            with self.assertRaises(OSError):
+                snapshotter.write()
+
+            os.mkdir(os.path.dirname(path))
+            snapshotter.write()
+            self.assertEqual(Snapshotter(path).load(), [b"lap data"])